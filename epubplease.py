@@ -6,15 +6,49 @@ import zipfile
 import sys
 import threading
 import queue
+import time
+import multiprocessing
+from multiprocessing.connection import wait as wait_for_connections
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox, scrolledtext
 from tkinterdnd2 import DND_FILES, TkinterDnD
-from PIL import Image, ImageTk
+from PIL import Image, ImageTk, ImageFilter, ImageStat, ImageChops
 from xml.sax.saxutils import escape as xml_escape
 import traceback # For detailed error logging
+import io
+import struct
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
+try:
+    import resource # POSIX only; used to cap isolated render worker memory
+except ImportError:
+    resource = None
 
 # --- Constants ---
 TEMP_DIR_PREFIX = "pdf2epub_py_"
+PAGE_OVERHEAD_BYTES = 1024 # Rough XHTML + manifest cost per page when sizing volumes
+OUTLINE_CUT_MIN_FILL = 0.5 # Only cut at a bookmark if the volume is at least this full
+PROGRESS_RATE_WINDOW_S = 15    # Pages/sec is averaged over this many seconds of page events
+PROGRESS_STALL_S = 30          # Warn in the GUI when no page has finished for this long
+ISOLATED_PAGE_TIMEOUT_S = 60   # Default per-page render time limit in isolated mode
+ISOLATED_PAGE_MEMORY_MB = 2048 # Default per-worker address space limit in isolated mode
+ISOLATED_WORKER_STARTUP_S = 60 # A render worker that isn't ready after this long fails the file
+FALLBACK_MIN_DPI = 36          # Lowest DPI tried before a page is replaced by a placeholder
+AUTO_CROP_PADDING_PT = 12      # Default white space kept around auto-cropped content, in points
+AUTO_CROP_BACKGROUND_FILL = 0.95 # Fills covering this share of the page count as background, not content
+MRC_BACKGROUND_SCALE = 3       # MRC background is stored at 1/N of the rendered resolution
+MRC_BACKGROUND_QUALITY = 60    # JPEG quality of the MRC background layer
+MRC_TEXT_ERASE_SIZE = 3        # Max-filter size (at background resolution) used to lift text out of the background
+MRC_MAX_TEXT_COVERAGE = 0.25   # Pages with more "text" than this share of pixels are photos/art: keep PNG
+MRC_MAX_SOLID_SHARE = 0.05     # Max share of the page in fully dark cells (plates, fills; text strokes are thinner)
+MRC_SOLID_CELL = 8             # Cell size in pixels for the solid-area check
+MRC_MAX_MEAN_ERROR = 8.0       # Max mean absolute error (0-255, worst channel) of the recomposed page
+PIPELINE_QUEUE_DEPTH = 8       # Max pages buffered between pipeline stages (caps memory use)
+PIPELINE_MAX_ENCODERS = 4      # Upper bound on encoder threads in the page pipeline
+PNG_COMPRESS_LEVEL = 6         # zlib level for page PNGs (MuPDF's default)
+PNG_STORE_MIN_BYTES_PER_PIXEL = 0.5 # PNGs at least this dense are stored, not deflated again, in the EPUB
+IMAGE_MEDIA_TYPES = {".png": "image/png", ".jpg": "image/jpeg", ".jpeg": "image/jpeg", ".webp": "image/webp"}
 
 # --- NEW Modern GUI Colors ---
 BG_COLOR = "#F0F0F0"          # Light grey background
@@ -54,10 +88,23 @@ image { width: 100%; height: 100%; object-fit: contain; }
 
 # --- Helper Functions for EPUB Generation (Restored) ---
 
-def create_content_opf(title, image_files, page_dimensions):
-    """Generates the content.opf XML string."""
+def create_content_opf(title, image_files, page_dimensions, series=None, mask_files=None):
+    """Generates the content.opf XML string.
+
+    series: optional (series_title, volume_number, volume_count) tuple for multi-volume output.
+    mask_files: optional per-page MRC text layer filenames (None for pages without one).
+    """
     book_uuid = uuid.uuid4()
     now = fitz.get_pdf_now() # Get timestamp in PDF format
+    series_meta = ""
+    if series:
+        series_title, volume_number, volume_count = series
+        series_meta = (
+            f'\n    <meta property="belongs-to-collection" id="series">{xml_escape(series_title)}</meta>'
+            f'\n    <meta refines="#series" property="collection-type">series</meta>'
+            f'\n    <meta refines="#series" property="group-position">{volume_number}</meta>'
+            f'\n    <meta property="dcterms:description">Volume {volume_number} of {volume_count}</meta>'
+        )
     manifest_items = [
         f'    <item id="nav" href="nav.xhtml" media-type="application/xhtml+xml" properties="nav"/>',
         f'    <item id="css" href="css/styles.css" media-type="text/css"/>'
@@ -70,8 +117,10 @@ def create_content_opf(title, image_files, page_dimensions):
         xhtml_href, image_href = f"xhtml/{page_id}.xhtml", f"images/{img_file}"
         manifest_items.extend([
             f'    <item id="{page_id}" href="{xhtml_href}" media-type="application/xhtml+xml"/>',
-            f'    <item id="{image_id}" href="{image_href}" media-type="image/png"/>' # Assuming PNG
+            f'    <item id="{image_id}" href="{image_href}" media-type="{image_media_type(img_file)}"/>'
         ])
+        if mask_files and mask_files[i]:
+            manifest_items.append(f'    <item id="mask{page_num}" href="images/{mask_files[i]}" media-type="{image_media_type(mask_files[i])}"/>')
         spine_items.append(f'    <itemref idref="{page_id}" properties="page-spread-left rendition:layout-pre-paginated rendition:orientation-auto rendition:spread-auto"/>')
 
     manifest_str = "\n".join(manifest_items)
@@ -87,7 +136,7 @@ def create_content_opf(title, image_files, page_dimensions):
     <meta name="cover" content="img1"/>
     <meta property="rendition:layout">pre-paginated</meta>
     <meta property="rendition:orientation">auto</meta>
-    <meta property="rendition:spread">auto</meta>
+    <meta property="rendition:spread">auto</meta>{series_meta}
   </metadata>
   <manifest>
 {manifest_str}
@@ -97,14 +146,18 @@ def create_content_opf(title, image_files, page_dimensions):
   </spine>
 </package>"""
 
-def create_nav_xhtml(title, image_files):
-    """Generates the nav.xhtml (EPUB3 ToC/Page List) XML string."""
+def create_nav_xhtml(title, image_files, start_page=1):
+    """Generates the nav.xhtml (EPUB3 ToC/Page List) XML string.
+
+    start_page: label of the first page, so later volumes keep the original PDF page numbers.
+    """
     toc_list_items, page_list_items = [], []
     for i, _ in enumerate(image_files):
         page_num = i + 1
+        page_label = start_page + i
         xhtml_href = f"xhtml/page{page_num}.xhtml"
-        toc_list_items.append(f'      <li><a href="{xhtml_href}">Page {page_num}</a></li>')
-        page_list_items.append(f'      <li><a href="{xhtml_href}">{page_num}</a></li>')
+        toc_list_items.append(f'      <li><a href="{xhtml_href}">Page {page_label}</a></li>')
+        page_list_items.append(f'      <li><a href="{xhtml_href}">{page_label}</a></li>')
 
     toc_list_str = "\n".join(toc_list_items)
     page_list_str = "\n".join(page_list_items)
@@ -116,105 +169,705 @@ def create_nav_xhtml(title, image_files):
 <nav epub:type="page-list" id="page-list" hidden=""><h1>Page List</h1><ol>{page_list_str}</ol></nav>
 </body></html>"""
 
-def create_page_xhtml(page_num, img_file, dimensions):
-    """Generates an XHTML string for a single EPUB page, wrapping the image."""
+def create_page_xhtml(page_num, img_file, dimensions, mask_file=None):
+    """Generates an XHTML string for a single EPUB page, wrapping the image.
+
+    If mask_file is given, it is layered over img_file as the MRC text layer.
+    """
     if not dimensions: dimensions = {"width": 600, "height": 800}
     vp_width, vp_height = int(dimensions["width"]), int(dimensions["height"])
     image_href = f"../images/{img_file}"
+    mask_layer = ""
+    if mask_file:
+        mask_layer = f'\n<image width="{vp_width}" height="{vp_height}" xlink:href="../images/{mask_file}" xmlns:xlink="http://www.w3.org/1999/xlink"/>'
 
     return f"""<?xml version="1.0" encoding="UTF-8"?>
 <!DOCTYPE html><html xmlns="http://www.w3.org/1999/xhtml" xmlns:epub="http://www.idpf.org/2007/ops" xml:lang="en" lang="en"><head>
 <title>Page {page_num}</title><meta charset="UTF-8"/><meta name="viewport" content="width={vp_width}, height={vp_height}"/>
 <link rel="stylesheet" type="text/css" href="../css/styles.css"/></head><body>
 <div class="page-svg-container"><svg xmlns="http://www.w3.org/2000/svg" version="1.1" width="{vp_width}" height="{vp_height}" viewBox="0 0 {vp_width} {vp_height}" preserveAspectRatio="xMidYMid meet">
-<image width="{vp_width}" height="{vp_height}" xlink:href="{image_href}" xmlns:xlink="http://www.w3.org/1999/xlink"/></svg></div></body></html>"""
+<image width="{vp_width}" height="{vp_height}" xlink:href="{image_href}" xmlns:xlink="http://www.w3.org/1999/xlink"/>{mask_layer}</svg></div></body></html>"""
+
+def image_media_type(filename):
+    """Returns the EPUB manifest media type for an image filename."""
+    return IMAGE_MEDIA_TYPES.get(os.path.splitext(filename)[1].lower(), "image/png")
+
+def content_clip(page, padding):
+    """Returns the page area holding visible content plus padding (in points), or None for the full page.
+
+    The box is the union of the page's text, image and vector extents. Fills that cover
+    (almost) the whole page are treated as background and ignored.
+    """
+    unrotated_rect = page.rect * page.derotation_matrix # get_bboxlog() ignores page rotation
+    page_area = abs(unrotated_rect)
+    content = fitz.Rect()
+    for kind, bbox in page.get_bboxlog():
+        rect = fitz.Rect(bbox)
+        if rect.is_empty or (kind == "fill-path" and abs(rect & unrotated_rect) >= AUTO_CROP_BACKGROUND_FILL * page_area):
+            continue
+        content |= rect
+    if content.is_empty:
+        return None # Blank page: keep it full size
+    clip = (content * page.rotation_matrix) + (-padding, -padding, padding, padding)
+    clip &= page.rect
+    if clip.is_empty or clip == page.rect:
+        return None
+    return clip
+
+def render_page_image(page, dpi, img_path, clip=None):
+    """Renders a single PDF page (or the clip area of it) to a PNG file at the given DPI."""
+    zoom = dpi / 72.0
+    mat = fitz.Matrix(zoom, zoom)
+    pix = page.get_pixmap(matrix=mat, alpha=False, clip=clip)
+    pix.save(img_path)
+
+def save_placeholder_image(dimensions, dpi, img_path):
+    """Writes a blank white page image, used when a page cannot be rendered."""
+    zoom = dpi / 72.0
+    width = max(1, int(dimensions["width"] * zoom))
+    height = max(1, int(dimensions["height"] * zoom))
+    pix = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, width, height), False)
+    pix.clear_with(255)
+    pix.save(img_path)
+
+def _apply_memory_limit(max_memory_mb):
+    """Caps this process's address space. Returns None if enforced, else why it is not."""
+    if not max_memory_mb:
+        return None
+    if resource is None:
+        return "not supported on this platform"
+    try:
+        limit = int(max_memory_mb * 1024 * 1024)
+        _, hard = resource.getrlimit(resource.RLIMIT_AS)
+        if hard != resource.RLIM_INFINITY and limit > hard:
+            limit = hard # An inherited hard limit (e.g. ulimit -v) can't be raised; keep the stricter one
+        resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+        return None
+    except (ValueError, OSError) as e:
+        return f"{type(e).__name__}: {e}"
+
+def _isolated_render_worker(pdf_path, conn, max_memory_mb):
+    """Worker process loop: renders pages sent over conn until it receives None.
+
+    Before taking any page it answers ("ready", None, limit_note) or ("startup_error", None, error).
+    """
+    limit_note = _apply_memory_limit(max_memory_mb)
+    try:
+        doc = fitz.open(pdf_path)
+    except Exception as e:
+        conn.send(("startup_error", None, f"{type(e).__name__}: {e}"))
+        return
+    conn.send(("ready", None, limit_note))
+    while True:
+        task = conn.recv()
+        if task is None:
+            break
+        page_index, dpi, img_path, clip = task
+        try:
+            render_page_image(doc[page_index], dpi, img_path, clip=fitz.Rect(clip) if clip else None)
+            conn.send(("ok", page_index, None))
+        except BaseException as e: # MemoryError included; the supervisor decides what to do
+            conn.send(("error", page_index, f"{type(e).__name__}: {e}"))
+    doc.close()
+
+def _spawn_render_worker(ctx, pdf_path, max_memory_mb):
+    """Starts one isolated render worker and returns its bookkeeping dict."""
+    parent_conn, child_conn = ctx.Pipe()
+    process = ctx.Process(target=_isolated_render_worker, args=(pdf_path, child_conn, max_memory_mb), daemon=True)
+    process.start()
+    child_conn.close()
+    return {"process": process, "conn": parent_conn, "ready": False, "task": None,
+            "deadline": time.monotonic() + ISOLATED_WORKER_STARTUP_S}
+
+def _stop_render_worker(worker):
+    """Kills a worker process, waits for it and closes its pipe. Returns the exit code."""
+    if worker["process"].is_alive():
+        worker["process"].terminate()
+    worker["process"].join(5)
+    worker["conn"].close()
+    return worker["process"].exitcode
+
+def render_pages_isolated(pdf_path, page_dimensions, dpi, raw_image_dir, status_queue,
+                          timeout_s=ISOLATED_PAGE_TIMEOUT_S, max_memory_mb=ISOLATED_PAGE_MEMORY_MB, workers=None, clips=None):
+    """Renders every page in supervised worker processes with a time and memory limit per page.
+
+    clips: optional per-page render areas (see content_clip); None entries render the full page.
+
+    A page that times out, crashes its worker or fails to render is retried at half the DPI
+    (down to FALLBACK_MIN_DPI) and finally replaced with a blank placeholder. A page's time
+    limit starts once its worker has reported ready. Raises RuntimeError if a worker cannot
+    start or if no page rendered at all. This is a generator: it yields (page_index, filename)
+    as soon as each page is finished, in completion order, and closing it stops the workers.
+    """
+    total_pages = len(page_dimensions)
+    if not total_pages:
+        return
+    fallback_dpis = [dpi]
+    while fallback_dpis[-1] // 2 >= FALLBACK_MIN_DPI:
+        fallback_dpis.append(fallback_dpis[-1] // 2)
+    if workers is None:
+        workers = max(1, (os.cpu_count() or 2) - 1)
+    workers = max(1, min(workers, total_pages))
+
+    ctx = multiprocessing.get_context("spawn") # Never fork a process that is running Tk threads
+    pool = [_spawn_render_worker(ctx, pdf_path, max_memory_mb) for _ in range(workers)]
+    pending = deque((i, 0) for i in range(total_pages))
+    image_files = [f"page-{i + 1}.png" for i in range(total_pages)]
+    placeholder_count = 0
+    limit_warned = False
+
+    def handle_failure(page_index, attempt, reason):
+        nonlocal placeholder_count
+        page_num = page_index + 1
+        if attempt + 1 < len(fallback_dpis):
+            status_queue.put(f"  ⚠️ Page {page_num} {reason} at {fallback_dpis[attempt]} DPI; retrying at {fallback_dpis[attempt + 1]} DPI.")
+            pending.appendleft((page_index, attempt + 1))
+            return False
+        status_queue.put(f"  ⚠️ Page {page_num} {reason} at {fallback_dpis[attempt]} DPI; using a placeholder page.")
+        save_placeholder_image(page_dimensions[page_index], fallback_dpis[-1], os.path.join(raw_image_dir, image_files[page_index]))
+        placeholder_count += 1
+        return True
 
-def write_to_file(filepath, content):
-    """Helper to write content to a file using UTF-8 encoding."""
     try:
-        with open(filepath, "w", encoding="utf-8") as f:
-            f.write(content)
-    except IOError as e:
-        raise IOError(f"Failed to write to {filepath}: {e}") from e
+        while pending or any(w["task"] for w in pool):
+            for worker in pool:
+                if worker["ready"] and worker["task"] is None and pending:
+                    page_index, attempt = pending.popleft()
+                    clip = tuple(clips[page_index]) if clips and clips[page_index] else None
+                    worker["conn"].send((page_index, fallback_dpis[attempt], os.path.join(raw_image_dir, image_files[page_index]), clip))
+                    worker["task"] = (page_index, attempt)
+                    worker["deadline"] = time.monotonic() + timeout_s
+
+            active = [w for w in pool if w["task"] or not w["ready"]]
+            next_deadline = min(w["deadline"] for w in active)
+            wait_for_connections([w["conn"] for w in active] + [w["process"].sentinel for w in active],
+                                 timeout=max(0, next_deadline - time.monotonic()))
+
+            for i, worker in enumerate(pool):
+                if worker["ready"] and worker["task"] is None:
+                    continue
+                message, dead = None, False
+                try:
+                    if worker["conn"].poll():
+                        message = worker["conn"].recv()
+                except (EOFError, OSError):
+                    dead = True
+                if message is None and not worker["process"].is_alive():
+                    dead = True
+                timed_out = message is None and not dead and time.monotonic() >= worker["deadline"]
+
+                if not worker["ready"]:
+                    if message and message[0] == "ready":
+                        worker["ready"] = True
+                        if message[2] and not limit_warned:
+                            status_queue.put(f"  ⚠️ Page memory limit of {max_memory_mb} MB is not enforced ({message[2]}); only the time limit applies.")
+                            limit_warned = True
+                    elif message and message[0] == "startup_error":
+                        raise RuntimeError(f"Isolated render worker could not open the PDF: {message[2]}")
+                    elif dead:
+                        raise RuntimeError(f"Isolated render worker died while starting (exit code {_stop_render_worker(worker)}).")
+                    elif timed_out:
+                        raise RuntimeError(f"Isolated render worker did not start within {ISOLATED_WORKER_STARTUP_S}s.")
+                    continue
+
+                page_index, attempt = worker["task"]
+                finished, reason = False, None
+                if message:
+                    if message[0] == "ok":
+                        finished = True
+                    else:
+                        reason = f"failed ({message[2]})"
+                elif dead or timed_out:
+                    exit_code = _stop_render_worker(worker)
+                    reason = f"crashed the renderer (exit code {exit_code})" if dead else f"exceeded the {timeout_s}s time limit"
+                    pool[i] = _spawn_render_worker(ctx, pdf_path, max_memory_mb)
+                else:
+                    continue
+
+                worker["task"] = None
+                if reason:
+                    finished = handle_failure(page_index, attempt, reason)
+                if finished:
+                    yield page_index, image_files[page_index]
+    finally:
+        for worker in pool:
+            try:
+                worker["conn"].send(None)
+            except (OSError, ValueError):
+                pass
+            _stop_render_worker(worker)
+
+    if placeholder_count == total_pages:
+        raise RuntimeError("No page could be rendered in isolated mode; see the warnings above.")
+
+def otsu_threshold(histogram):
+    """Returns the Otsu threshold for a 256-bin grayscale histogram."""
+    total = sum(histogram)
+    sum_all = sum(i * h for i, h in enumerate(histogram))
+    sum_bg, weight_bg = 0, 0
+    best_threshold, best_variance = 128, -1.0
+    for t in range(256):
+        weight_bg += histogram[t]
+        if weight_bg == 0:
+            continue
+        weight_fg = total - weight_bg
+        if weight_fg == 0:
+            break
+        sum_bg += t * histogram[t]
+        mean_bg = sum_bg / weight_bg
+        mean_fg = (sum_all - sum_bg) / weight_fg
+        variance = weight_bg * weight_fg * (mean_bg - mean_fg) ** 2
+        if variance > best_variance:
+            best_threshold, best_variance = t + 1, variance
+    return best_threshold
+
+def encode_mrc_image(img, png_size):
+    """Splits a rendered page into a low-res JPEG background and a 1-bit text layer.
+
+    The text layer is a two-colour PNG (transparent + the average text colour) at full
+    resolution. Returns (background_bytes, text_bytes), or None when the page should stay
+    a PNG because the split would be lossy or not worth it: the "text" covers more than
+    MRC_MAX_TEXT_COVERAGE of the page, contains solid areas (photos, plates, fills) larger
+    than MRC_MAX_SOLID_SHARE, the layers are not smaller than png_size, or the recomposed
+    page differs from the original by more than MRC_MAX_MEAN_ERROR on average.
+    """
+    gray = img.convert("L")
+    histogram = gray.histogram()
+    threshold = otsu_threshold(histogram)
+    text_pixels = sum(histogram[:threshold])
+    if text_pixels == 0:
+        return None # Nothing dark enough to treat as text
+    if text_pixels > MRC_MAX_TEXT_COVERAGE * img.width * img.height:
+        return None # Photo, illustration or dark cover: flattening it to one colour would destroy it
+    text_sel = gray.point(lambda v: 255 if v < threshold else 0)
+    cells = text_sel.resize((max(1, img.width // MRC_SOLID_CELL), max(1, img.height // MRC_SOLID_CELL)), Image.Resampling.BOX)
+    if sum(cells.histogram()[250:]) > MRC_MAX_SOLID_SHARE * cells.width * cells.height:
+        return None # Large solid dark regions would be flattened to one colour
+
+    text_color = tuple(int(c) for c in ImageStat.Stat(img, mask=text_sel).mean)
+    mask = Image.new("P", img.size, 0)
+    mask.putpalette([255, 255, 255, *text_color])
+    mask.paste(1, mask=text_sel)
+    mask_buf = io.BytesIO()
+    mask.save(mask_buf, "PNG", transparency=0, bits=1, optimize=True)
+
+    background = img.reduce(MRC_BACKGROUND_SCALE).filter(ImageFilter.MaxFilter(MRC_TEXT_ERASE_SIZE))
+    bg_buf = io.BytesIO()
+    background.save(bg_buf, "JPEG", quality=MRC_BACKGROUND_QUALITY, optimize=True)
+    if bg_buf.tell() + mask_buf.tell() >= png_size:
+        return None
+
+    # Recompose the page as a reader would show it and reject visible damage.
+    bg_buf.seek(0)
+    recomposed = Image.open(bg_buf).convert("RGB").resize(img.size, Image.Resampling.BILINEAR)
+    recomposed.paste(text_color, mask=text_sel)
+    if max(ImageStat.Stat(ImageChops.difference(img, recomposed)).mean) > MRC_MAX_MEAN_ERROR:
+        return None
+    return bg_buf.getvalue(), mask_buf.getvalue()
+
+def encode_png_rgb(width, height, samples):
+    """Encodes raw 8-bit RGB samples as a PNG.
+
+    Uses filter type None on every row, like MuPDF's own writer, which compresses noisy
+    scans noticeably better than adaptive filtering. zlib releases the GIL, so encoder
+    threads run in parallel with rendering.
+    """
+    stride = width * 3
+    rows = memoryview(samples)
+    raw = b"".join(b"\x00" + rows[y * stride:(y + 1) * stride] for y in range(height))
+
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    return (b"\x89PNG\r\n\x1a\n"
+            + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(raw, PNG_COMPRESS_LEVEL))
+            + chunk(b"IEND", b""))
+
+def image_is_precompressed(filename, data):
+    """True if deflating this image again in the EPUB zip would only waste CPU.
+
+    JPEGs never shrink. PNGs of dense content (scans, photos) don't either, but PNGs of
+    flat pages still shrink several times over because PNG's own deflate can't exploit
+    long runs of identical rows, so those keep being deflated.
+    """
+    ext = os.path.splitext(filename)[1].lower()
+    if ext in (".jpg", ".jpeg", ".webp"):
+        return True
+    if ext == ".png" and len(data) >= 24:
+        width, height = struct.unpack(">II", data[16:24])
+        return len(data) >= PNG_STORE_MIN_BYTES_PER_PIXEL * width * height
+    return False
+
+def encode_page_files(page_index, rendered, mrc=False):
+    """Encodes a rendered page into the files stored in the EPUB.
+
+    rendered is either {"png": bytes} (isolated mode) or {"size": (w, h), "samples": bytes}
+    with raw RGB samples from the render thread.
+    Returns {"image": (filename, data), "mask": (filename, data) or None}.
+    """
+    page_num = page_index + 1
+    img = None
+    if "png" in rendered:
+        png_bytes = rendered["png"]
+    else:
+        width, height = rendered["size"]
+        png_bytes = encode_png_rgb(width, height, rendered["samples"])
+    if mrc:
+        if "samples" in rendered:
+            img = Image.frombytes("RGB", rendered["size"], rendered["samples"])
+        else:
+            img = Image.open(io.BytesIO(png_bytes)).convert("RGB")
+        layers = encode_mrc_image(img, len(png_bytes))
+        if layers:
+            return {"image": (f"page-{page_num}-bg.jpg", layers[0]), "mask": (f"page-{page_num}-text.png", layers[1])}
+    return {"image": (f"page-{page_num}.png", png_bytes), "mask": None}
+
+def run_page_pipeline(rendered_pages, encode_page, write_page, encoder_threads=None, queue_depth=PIPELINE_QUEUE_DEPTH):
+    """Runs render -> encode -> write over every page with bounded queues between the stages.
+
+    rendered_pages is an iterator of (page_index, rendered) pairs in any order, consumed in
+    the calling thread; encode_page(i, rendered) runs in a pool of encoder threads and
+    write_page(i, encoded) in a single writer thread, so rendering page N+1 overlaps
+    encoding and writing page N while at most queue_depth pages wait per stage.
+    Returns the utilization (busy time / wall time) of each stage.
+    """
+    if encoder_threads is None:
+        encoder_threads = max(1, min(PIPELINE_MAX_ENCODERS, (os.cpu_count() or 2) - 1))
+    encode_queue = queue.Queue(maxsize=queue_depth)
+    write_queue = queue.Queue(maxsize=queue_depth)
+    abort = threading.Event()
+    errors = []
+    busy = {"render": 0.0, "encode": 0.0, "write": 0.0}
+    busy_lock = threading.Lock()
+
+    def put(q, item):
+        while not abort.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def get(q):
+        while not abort.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        return None # Aborting: behave as if the stream ended
+
+    def add_busy(stage, started):
+        with busy_lock:
+            busy[stage] += time.perf_counter() - started
+
+    def encoder():
+        try:
+            while (item := get(encode_queue)) is not None:
+                started = time.perf_counter()
+                encoded = encode_page(item[0], item[1])
+                add_busy("encode", started)
+                if not put(write_queue, (item[0], encoded)):
+                    break
+        except Exception as e:
+            errors.append(e)
+            abort.set()
+
+    def writer():
+        try:
+            while (item := get(write_queue)) is not None:
+                started = time.perf_counter()
+                write_page(item[0], item[1])
+                add_busy("write", started)
+        except Exception as e:
+            errors.append(e)
+            abort.set()
+
+    wall_start = time.perf_counter()
+    encoders = [threading.Thread(target=encoder, daemon=True) for _ in range(encoder_threads)]
+    writer_thread = threading.Thread(target=writer, daemon=True)
+    for t in encoders + [writer_thread]:
+        t.start()
+    rendered_pages = iter(rendered_pages)
+    try:
+        while True:
+            started = time.perf_counter()
+            item = next(rendered_pages, None)
+            add_busy("render", started)
+            if item is None or not put(encode_queue, item):
+                break
+    except Exception as e:
+        errors.append(e)
+        abort.set()
+    finally:
+        if hasattr(rendered_pages, "close"):
+            rendered_pages.close() # Stops an isolated renderer's workers on abort
+        for _ in encoders:
+            put(encode_queue, None)
+        for t in encoders:
+            t.join()
+        put(write_queue, None)
+        writer_thread.join()
+
+    if errors:
+        raise errors[0]
+    wall = max(time.perf_counter() - wall_start, 1e-9)
+    return {"render": busy["render"] / wall,
+            "encode": busy["encode"] / (wall * encoder_threads),
+            "encode_threads": encoder_threads,
+            "write": busy["write"] / wall}
+
+def plan_volumes(page_sizes, outline_starts, max_pages=None, max_bytes=None):
+    """Splits page indices into volumes bounded by page count and/or estimated byte size.
+
+    page_sizes: estimated archive bytes per page (index = 0-based page number).
+    outline_starts: set of 0-based page indices where a top-level bookmark begins.
+    Returns a list of (first_index, last_index_exclusive) tuples.
+    """
+    total = len(page_sizes)
+    if not max_pages and not max_bytes:
+        return [(0, total)]
+
+    volumes = []
+    start, used_bytes = 0, 0
+    for i in range(total):
+        count = i - start
+        over_pages = max_pages and count + 1 > max_pages
+        over_bytes = max_bytes and count > 0 and used_bytes + page_sizes[i] > max_bytes
+        if count > 0 and (over_pages or over_bytes):
+            # Prefer the last bookmark boundary inside this volume, as long as it
+            # doesn't leave the volume mostly empty.
+            cut = i
+            min_cut = start + max(1, int(count * OUTLINE_CUT_MIN_FILL))
+            for b in range(i - 1, min_cut - 1, -1):
+                if b in outline_starts:
+                    cut = b
+                    break
+            volumes.append((start, cut))
+            start = cut
+            used_bytes = sum(page_sizes[start:i])
+        used_bytes += page_sizes[i]
+    volumes.append((start, total))
+    return volumes
+
+def open_epub_archive(output_path):
+    """Creates the EPUB zip and writes the uncompressed mimetype entry, which must come first."""
+    epub_zip = zipfile.ZipFile(output_path, "w", zipfile.ZIP_DEFLATED)
+    epub_zip.writestr("mimetype", "application/epub+zip", compress_type=zipfile.ZIP_STORED)
+    return epub_zip
+
+def write_epub_page(epub_zip, page_num, page_label, img_file, img_data, dimensions, mask_file=None, mask_data=None):
+    """Adds one page's image(s) and XHTML to an open EPUB archive."""
+    for name, data in [(img_file, img_data), (mask_file, mask_data)]:
+        if name:
+            compress_type = zipfile.ZIP_STORED if image_is_precompressed(name, data) else zipfile.ZIP_DEFLATED
+            epub_zip.writestr(f"OEBPS/images/{name}", data, compress_type=compress_type)
+    epub_zip.writestr(f"OEBPS/xhtml/page{page_num}.xhtml", create_page_xhtml(page_label, img_file, dimensions, mask_file=mask_file))
+
+def write_epub_metadata(epub_zip, title, image_files, page_dimensions, start_page=1, series=None, mask_files=None):
+    """Adds container.xml, content.opf, nav.xhtml and the stylesheet to an open EPUB archive."""
+    epub_zip.writestr("META-INF/container.xml", CONTAINER_XML_CONTENT)
+    epub_zip.writestr("OEBPS/content.opf", create_content_opf(title, image_files, page_dimensions, series=series, mask_files=mask_files))
+    epub_zip.writestr("OEBPS/nav.xhtml", create_nav_xhtml(title, image_files, start_page=start_page))
+    epub_zip.writestr("OEBPS/css/styles.css", CSS_CONTENT)
+
+def build_epub_archive(output_path, title, image_files, page_dimensions, raw_image_dir, status_queue, start_page=1, series=None, mask_files=None,
+                       on_page=None):
+    """Packages already-encoded page images from raw_image_dir into an EPUB at output_path.
+
+    on_page, if given, is called after each page has been added to the archive.
+    """
+    if mask_files is None:
+        mask_files = [None] * len(image_files)
+    status_queue.put(f"  -> Creating EPUB archive: {output_path}")
+    with open_epub_archive(output_path) as epub_zip:
+        for i, img_filename in enumerate(image_files):
+            with open(os.path.join(raw_image_dir, img_filename), "rb") as f:
+                img_data = f.read()
+            mask_data = None
+            if mask_files[i]:
+                with open(os.path.join(raw_image_dir, mask_files[i]), "rb") as f:
+                    mask_data = f.read()
+            write_epub_page(epub_zip, i + 1, start_page + i, img_filename, img_data, page_dimensions[i], mask_files[i], mask_data)
+            if on_page:
+                on_page()
+        write_epub_metadata(epub_zip, title, image_files, page_dimensions, start_page=start_page, series=series, mask_files=mask_files)
 
 # --- Core Conversion Logic (Worker Thread - Restored) ---
 
-def pdf_to_epub_fxl_core(pdf_path, dpi, status_queue, output_dir=None):
-    """Performs the PDF to EPUB conversion for a single file."""
+def pdf_to_epub_fxl_core(pdf_path, dpi, status_queue, output_dir=None, max_volume_pages=None, max_volume_mb=None,
+                         isolated=False, page_timeout_s=ISOLATED_PAGE_TIMEOUT_S, page_memory_mb=ISOLATED_PAGE_MEMORY_MB,
+                         mrc=False, auto_crop=False, crop_padding=AUTO_CROP_PADDING_PT):
+    """Performs the PDF to EPUB conversion for a single file.
+
+    If max_volume_pages or max_volume_mb is set, the output is split into a series of
+    numbered volumes, cut at bookmark boundaries where possible and packaged in parallel.
+    If isolated is set, pages are rendered in supervised worker processes (see render_pages_isolated).
+    If mrc is set, pages are stored as a low-res background plus a 1-bit text layer when that is smaller.
+    If auto_crop is set, only each page's content box plus crop_padding points is rendered.
+    """
     abs_pdf_path = os.path.abspath(pdf_path)
     pdf_basename = os.path.basename(abs_pdf_path)
-    pdf_title = os.path.splitext(pdf_basename)[0].replace("_", " ")
-    epub_filename = f"{os.path.splitext(pdf_basename)[0]}.epub"
+    pdf_stem = os.path.splitext(pdf_basename)[0]
+    pdf_title = pdf_stem.replace("_", " ")
+    epub_filename = f"{pdf_stem}.epub"
 
     if output_dir is None:
-        output_path = os.path.join(os.path.dirname(abs_pdf_path), epub_filename)
-    else:
-        output_path = os.path.join(output_dir, epub_filename)
+        output_dir = os.path.dirname(abs_pdf_path)
+    output_path = os.path.join(output_dir, epub_filename)
 
     temp_dir = None
     try:
-        temp_dir = os.path.join(os.path.dirname(output_path), TEMP_DIR_PREFIX + uuid.uuid4().hex)
-        build_dir = os.path.join(temp_dir, "epub_build")
+        temp_dir = os.path.join(output_dir, TEMP_DIR_PREFIX + uuid.uuid4().hex)
         raw_image_dir = os.path.join(temp_dir, "images_raw")
-        os.makedirs(build_dir, exist_ok=True)
         os.makedirs(raw_image_dir, exist_ok=True)
 
-        oebps_dir = os.path.join(build_dir, "OEBPS")
-        meta_inf_dir = os.path.join(build_dir, "META-INF")
-        images_dest_dir = os.path.join(oebps_dir, "images")
-        xhtml_dir = os.path.join(oebps_dir, "xhtml")
-        css_dir = os.path.join(oebps_dir, "css")
-        for d in [oebps_dir, meta_inf_dir, images_dest_dir, xhtml_dir, css_dir]:
-            os.makedirs(d, exist_ok=True)
-
         doc = fitz.open(abs_pdf_path)
-        image_files = []
-        page_dimensions = []
         total_pages = len(doc)
+        if total_pages == 0: raise RuntimeError("No images generated from PDF.")
         status_queue.put(f"Processing {pdf_basename}: {total_pages} pages...")
-
-        for i, page in enumerate(doc):
-            page_num = i + 1
-            # Minimal progress update to queue to avoid flooding
-            if (i + 1) % 10 == 0 or (i + 1) == total_pages:
-                 status_queue.put(f"  -> Rendering page {page_num}/{total_pages}...")
-            rect = page.rect
-            page_dimensions.append({"width": rect.width, "height": rect.height})
+        # Byte-bounded volumes are packaged in a second pass over the pages, which is reported as progress too.
+        work_passes = 2 if max_volume_mb else 1
+        status_queue.put(("FILE_PAGES", total_pages, work_passes))
+        clips = [content_clip(page, crop_padding) if auto_crop else None for page in doc]
+        page_dimensions = []
+        for page, clip in zip(doc, clips):
+            area = clip or page.rect
+            page_dimensions.append({"width": area.width, "height": area.height})
+        if auto_crop:
+            status_queue.put(f"  -> Auto-crop trimmed margins on {sum(1 for c in clips if c)}/{total_pages} pages.")
+        outline_starts = {entry[2] - 1 for entry in doc.get_toc(simple=True) if entry[0] == 1 and entry[2] > 0}
+
+        if isolated:
+            doc.close()
+            def rendered_pages():
+                # Pages enter the pipeline as soon as a worker finishes them.
+                for i, img_filename in render_pages_isolated(abs_pdf_path, page_dimensions, dpi, raw_image_dir, status_queue,
+                                                             timeout_s=page_timeout_s, max_memory_mb=page_memory_mb, clips=clips):
+                    with open(os.path.join(raw_image_dir, img_filename), "rb") as f:
+                        yield i, {"png": f.read()}
+        else:
             zoom = dpi / 72.0
             mat = fitz.Matrix(zoom, zoom)
-            pix = page.get_pixmap(matrix=mat, alpha=False)
-            img_filename = f"page-{page_num}.png"
-            img_raw_path = os.path.join(raw_image_dir, img_filename)
-            pix.save(img_raw_path)
-            image_files.append(img_filename)
-        doc.close()
-        status_queue.put(f"  -> Rendered {len(image_files)} pages.")
-        if not image_files: raise RuntimeError("No images generated from PDF.")
-
-        status_queue.put("  -> Generating EPUB structure...")
-        write_to_file(os.path.join(build_dir, "mimetype"), "application/epub+zip")
-        write_to_file(os.path.join(meta_inf_dir, "container.xml"), CONTAINER_XML_CONTENT)
-        write_to_file(os.path.join(oebps_dir, "content.opf"), create_content_opf(pdf_title, image_files, page_dimensions))
-        write_to_file(os.path.join(oebps_dir, "nav.xhtml"), create_nav_xhtml(pdf_title, image_files))
-        write_to_file(os.path.join(css_dir, "styles.css"), CSS_CONTENT)
-
-        status_queue.put("  -> Creating page files and copying images...")
-        for i, img_filename in enumerate(image_files):
-            page_num = i + 1
-            xhtml_content = create_page_xhtml(page_num, img_filename, page_dimensions[i])
-            write_to_file(os.path.join(xhtml_dir, f"page{page_num}.xhtml"), xhtml_content)
-            shutil.copy2(os.path.join(raw_image_dir, img_filename), os.path.join(images_dest_dir, img_filename))
-
-        status_queue.put(f"  -> Creating EPUB archive: {output_path}")
-        with zipfile.ZipFile(output_path, "w", zipfile.ZIP_DEFLATED) as epub_zip:
-            epub_zip.write(os.path.join(build_dir, "mimetype"), "mimetype", compress_type=zipfile.ZIP_STORED)
-            for root, _, files in os.walk(build_dir):
-                if os.path.basename(root) == os.path.basename(build_dir) and "mimetype" in files:
-                    files.remove("mimetype")
-                for file in files:
-                    file_path = os.path.join(root, file)
-                    archive_name = os.path.relpath(file_path, build_dir)
-                    epub_zip.write(file_path, archive_name, compress_type=zipfile.ZIP_DEFLATED)
+            # PyMuPDF objects must stay on this thread; encoder threads only get the raw samples.
+            def rendered_pages():
+                for i in range(total_pages):
+                    pix = doc[i].get_pixmap(matrix=mat, alpha=False, clip=clips[i])
+                    yield i, {"size": (pix.width, pix.height), "samples": pix.samples}
+
+        def encode_page(i, rendered):
+            return encode_page_files(i, rendered, mrc=mrc)
+
+        image_files = [None] * total_pages
+        mask_files = [None] * total_pages
+        page_sizes = [0] * total_pages
+        progress = {"done": 0, "packaged": 0}
+        progress_lock = threading.Lock()
+        def record_page(i, encoded):
+            image_files[i] = encoded["image"][0]
+            mask_files[i] = encoded["mask"][0] if encoded["mask"] else None
+            page_sizes[i] = len(encoded["image"][1]) + (len(encoded["mask"][1]) if encoded["mask"] else 0) + PAGE_OVERHEAD_BYTES
+            progress["done"] += 1
+            status_queue.put(("PAGE_DONE", progress["done"], total_pages))
+            # Minimal progress update to queue to avoid flooding
+            if progress["done"] % 10 == 0 or progress["done"] == total_pages:
+                status_queue.put(f"  -> Processed page {progress['done']}/{total_pages}...")
+
+        def volume_specs(volumes):
+            width = max(2, len(str(len(volumes))))
+            specs = []
+            for v, (first, last) in enumerate(volumes):
+                volume_number = v + 1
+                specs.append({
+                    "first": first, "last": last,
+                    "output_path": os.path.join(output_dir, f"{pdf_stem} - Vol {volume_number:0{width}d}.epub"),
+                    "title": f"{pdf_title} (Vol. {volume_number})",
+                    "series": (pdf_title, volume_number, len(volumes)),
+                })
+            if len(specs) == 1:
+                specs[0].update(output_path=output_path, title=pdf_title, series=None)
+            return specs
+
+        if max_volume_mb:
+            # Byte-bounded volumes can only be planned once every page is encoded,
+            # so the writer stages pages on disk and volumes are packaged afterwards.
+            def write_page(i, encoded):
+                for name, data in filter(None, [encoded["image"], encoded["mask"]]):
+                    with open(os.path.join(raw_image_dir, name), "wb") as f:
+                        f.write(data)
+                record_page(i, encoded)
+
+            stats = run_page_pipeline(rendered_pages(), encode_page, write_page)
+            max_bytes = int(max_volume_mb * 1024 * 1024)
+            specs = volume_specs(plan_volumes(page_sizes, outline_starts, max_pages=max_volume_pages, max_bytes=max_bytes))
+            if len(specs) > 1:
+                status_queue.put(f"  -> Splitting into {len(specs)} volumes...")
+            def package_page():
+                with progress_lock: # Volumes are packaged in parallel
+                    progress["packaged"] += 1
+                    status_queue.put(("PAGE_PACKAGED", progress["packaged"], total_pages))
+            try:
+                with ThreadPoolExecutor(max_workers=min(len(specs), os.cpu_count() or 1)) as pool:
+                    futures = [pool.submit(build_epub_archive, spec["output_path"], spec["title"],
+                                           image_files[spec["first"]:spec["last"]], page_dimensions[spec["first"]:spec["last"]],
+                                           raw_image_dir, status_queue, start_page=spec["first"] + 1, series=spec["series"],
+                                           mask_files=mask_files[spec["first"]:spec["last"]], on_page=package_page)
+                               for spec in specs]
+                    for future in futures:
+                        future.result() # Re-raise the first volume failure, if any
+            except BaseException:
+                # The pool has waited for every volume by now; drop all of them, like the streaming path.
+                for spec in specs:
+                    if os.path.exists(spec["output_path"]):
+                        os.remove(spec["output_path"]) # Don't leave truncated EPUBs behind
+                raise
+        else:
+            # Page-count volumes are known up front, so pages stream straight into their archives.
+            specs = volume_specs(plan_volumes([0] * total_pages, outline_starts, max_pages=max_volume_pages))
+            if len(specs) > 1:
+                status_queue.put(f"  -> Splitting into {len(specs)} volumes...")
+            volume_of_page = [v for v, spec in enumerate(specs) for _ in range(spec["first"], spec["last"])]
+            # Each archive is open only while its pages are in flight, so many volumes don't exhaust file handles.
+            zips = [None] * len(specs)
+            pages_left = [spec["last"] - spec["first"] for spec in specs]
+            created = []
+            try:
+                def write_page(i, encoded):
+                    v = volume_of_page[i]
+                    spec = specs[v]
+                    if zips[v] is None:
+                        status_queue.put(f"  -> Creating EPUB archive: {spec['output_path']}")
+                        created.append(spec["output_path"])
+                        zips[v] = open_epub_archive(spec["output_path"])
+                    mask_file, mask_data = encoded["mask"] or (None, None)
+                    write_epub_page(zips[v], i - spec["first"] + 1, i + 1, encoded["image"][0], encoded["image"][1],
+                                    page_dimensions[i], mask_file, mask_data)
+                    record_page(i, encoded)
+                    pages_left[v] -= 1
+                    if not pages_left[v]:
+                        first, last = spec["first"], spec["last"]
+                        write_epub_metadata(zips[v], spec["title"], image_files[first:last], page_dimensions[first:last],
+                                            start_page=first + 1, series=spec["series"], mask_files=mask_files[first:last])
+                        zips[v].close()
+                        zips[v] = None
+
+                stats = run_page_pipeline(rendered_pages(), encode_page, write_page)
+            except BaseException:
+                for epub_zip in zips:
+                    if epub_zip:
+                        epub_zip.close()
+                for path in created:
+                    if os.path.exists(path):
+                        os.remove(path) # Don't leave truncated EPUBs behind
+                raise
+        if not isolated:
+            doc.close()
+
+        if mrc:
+            status_queue.put(f"  -> MRC applied to {sum(1 for m in mask_files if m)}/{total_pages} pages.")
+        status_queue.put(f"  -> Stage utilization: render {stats['render']:.0%}, encode {stats['encode']:.0%} "
+                         f"({stats['encode_threads']} threads), write {stats['write']:.0%}")
 
         status_queue.put("DONE_FILE")
         print(f"ERROR: Worker thread for {pdf_basename} finished successfully.")
@@ -243,6 +896,187 @@ def pdf_to_epub_fxl_core(pdf_path, dpi, status_queue, output_dir=None):
         # else:
             # print(f"DEBUG: No temp dir cleanup needed for {pdf_basename}.") # Remove
 
+# --- Progress Model ---
+
+def format_duration(seconds):
+    """Formats a number of seconds as e.g. '45s', '3m 05s' or '1h 02m'."""
+    seconds = int(round(seconds))
+    if seconds < 60:
+        return f"{seconds}s"
+    minutes, seconds = divmod(seconds, 60)
+    if minutes < 60:
+        return f"{minutes}m {seconds:02d}s"
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}h {minutes:02d}m"
+
+def count_pdf_pages(pdf_path):
+    """Returns the page count of a PDF, or 0 if it cannot be opened."""
+    try:
+        with fitz.open(pdf_path) as doc:
+            return len(doc)
+    except Exception:
+        return 0
+
+def count_batch_pages(pdf_paths, status_queue):
+    """Counts the pages of every PDF in a batch off the GUI thread.
+
+    Puts ("PAGE_COUNT", index, pages) per file and ("PAGES_COUNTED",) at the end. The
+    batch only starts converting afterwards, so PyMuPDF is never used from two threads.
+    """
+    for index, pdf_path in enumerate(pdf_paths):
+        status_queue.put(("PAGE_COUNT", index, count_pdf_pages(pdf_path)))
+    status_queue.put(("PAGES_COUNTED",))
+
+class BatchProgress:
+    """Page-weighted batch progress with moving-average throughput and ETAs.
+
+    Pages are first converted (PAGE_DONE). In passes == 2 batches (byte-limited volumes)
+    they are then packaged in a separate, much faster phase (PAGE_PACKAGED), which gets its
+    own rate so it neither skews the pages/s figure nor the ETA.
+    """
+    def __init__(self, file_page_counts):
+        """file_page_counts: expected pages per file; unknown (0) counts are fixed by set_file_pages."""
+        self.file_pages = [max(1, n) for n in file_page_counts]
+        self.passes = 1
+        self.counted = 0
+        self.current_file = -1
+        self.current_done = 0     # Converted pages of the current file
+        self.current_packaged = 0 # Packaged pages of the current file
+        self.finished_files = 0
+        self.converted_pages = 0  # Pages of files that finished successfully
+        self.converted_total = 0  # Pages converted so far across the batch, failed files included
+        self.packaged_total = 0
+        self.samples = deque()          # (timestamp, converted_total) within the rate window
+        self.package_samples = deque()  # (timestamp, packaged_total) within the rate window
+        self.last_page_time = None
+        self.started = time.monotonic()
+
+    def start_file(self, index):
+        """Marks the file at index as the one currently converting."""
+        self.current_file = index
+        self.current_done = 0
+        self.current_packaged = 0
+        self.last_page_time = time.monotonic()
+
+    def set_file_pages(self, total_pages, passes=1, index=None):
+        """Updates a file's page count (the current file's by default) and whether a packaging pass follows."""
+        if index is None:
+            index = self.current_file
+            self.passes = max(1, passes)
+        else:
+            self.counted += 1
+        if 0 <= index < len(self.file_pages):
+            self.file_pages[index] = max(1, total_pages)
+
+    def _record(self, samples, total):
+        now = time.monotonic()
+        self.last_page_time = now
+        samples.append((now, total))
+        while len(samples) > 2 and now - samples[0][0] > PROGRESS_RATE_WINDOW_S:
+            samples.popleft()
+
+    def page_done(self, done):
+        """Records that done pages of the current file are converted."""
+        self.converted_total += max(0, done - self.current_done)
+        self.current_done = done
+        self._record(self.samples, self.converted_total)
+
+    def page_packaged(self, done):
+        """Records that done pages of the current file are packaged into their volumes."""
+        self.packaged_total += max(0, done - self.current_packaged)
+        self.current_packaged = done
+        self._record(self.package_samples, self.packaged_total)
+
+    def finish_file(self, succeeded=True):
+        """Counts the current file as finished; only a successful file's pages count as converted."""
+        if 0 <= self.current_file < len(self.file_pages):
+            self.finished_files = self.current_file + 1
+            if succeeded:
+                self.converted_pages += self.file_pages[self.current_file]
+        self.current_done = 0
+        self.current_packaged = 0
+
+    @property
+    def fraction(self):
+        """Share of all pages in the batch that are done, from 0.0 to 1.0."""
+        done_pages = sum(self.file_pages[:self.finished_files])
+        if self.finished_files <= self.current_file < len(self.file_pages):
+            done_pages += (self.current_done + self.current_packaged) / self.passes
+        return min(1.0, done_pages / sum(self.file_pages))
+
+    @staticmethod
+    def _rate(samples):
+        if len(samples) < 2:
+            return None
+        (t0, p0), (t1, p1) = samples[0], samples[-1]
+        return (p1 - p0) / (t1 - t0) if t1 > t0 else None
+
+    @property
+    def pages_per_second(self):
+        """Conversion throughput over the last PROGRESS_RATE_WINDOW_S seconds, or None before two samples exist."""
+        return self._rate(self.samples)
+
+    @property
+    def packaged_pages_per_second(self):
+        """Packaging throughput over the last PROGRESS_RATE_WINDOW_S seconds of packaging, or None if unknown."""
+        return self._rate(self.package_samples)
+
+    @property
+    def packaging(self):
+        """True while the current file is in its packaging phase."""
+        return self.passes > 1 and self.current_packaged > 0
+
+    @property
+    def seconds_since_last_page(self):
+        """Time since the last page event (or file start), or None when idle."""
+        return None if self.last_page_time is None else time.monotonic() - self.last_page_time
+
+    def etas(self):
+        """Returns (file_eta_s, batch_eta_s), each None until a throughput is known.
+
+        Packaging time is only included once its rate has been measured.
+        """
+        rate = self.pages_per_second
+        if not rate or not 0 <= self.current_file < len(self.file_pages):
+            return None, None
+        package_rate = self.packaged_pages_per_second if self.passes > 1 else None
+        def seconds(convert_pages, package_pages):
+            return convert_pages / rate + (package_pages / package_rate if package_rate else 0)
+        pages = self.file_pages[self.current_file]
+        file_left = seconds(max(0, pages - self.current_done), max(0, pages - self.current_packaged))
+        later_pages = sum(self.file_pages[self.current_file + 1:])
+        return file_left, file_left + seconds(later_pages, later_pages)
+
+    def summary(self):
+        """One-line summary for the end of a batch."""
+        elapsed = time.monotonic() - self.started
+        return f"{self.converted_pages} pages in {format_duration(elapsed)} ({self.converted_pages / max(elapsed, 1e-9):.1f} pages/s average)"
+
+    def describe(self):
+        """One-line status for the GUI: page position, throughput, ETAs and stall warning."""
+        if self.current_file < 0:
+            return f"Counting pages: {self.counted}/{len(self.file_pages)} files..."
+        if self.current_file >= len(self.file_pages):
+            return ""
+        pages = self.file_pages[self.current_file]
+        if self.packaging:
+            position = f"packaging page {self.current_packaged}/{pages}"
+            rate = self.packaged_pages_per_second
+        else:
+            position = f"page {self.current_done}/{pages}"
+            rate = self.pages_per_second
+        parts = [f"File {self.current_file + 1}/{len(self.file_pages)}: {position}"]
+        if rate is not None:
+            parts.append(f"{rate:.1f} pages/s")
+        file_eta, batch_eta = self.etas()
+        if file_eta is not None:
+            parts.append(f"file ETA {format_duration(file_eta)}")
+            parts.append(f"batch ETA {format_duration(batch_eta)}")
+        idle = self.seconds_since_last_page
+        if idle is not None and idle >= PROGRESS_STALL_S:
+            parts.append(f"⚠️ no page finished for {format_duration(idle)}")
+        return " · ".join(parts)
+
 # --- GUI Application ---
 
 class PdfToEpubApp(TkinterDnD.Tk):
@@ -348,7 +1182,17 @@ class PdfToEpubApp(TkinterDnD.Tk):
         self.pdf_file_list = []
         self.current_conversion_index = -1
         self.dpi_var = tk.StringVar(value="150")
+        self.max_volume_pages_var = tk.StringVar(value="") # Blank = no splitting
+        self.max_volume_mb_var = tk.StringVar(value="")
+        self.isolated_var = tk.BooleanVar(value=False)
+        self.mrc_var = tk.BooleanVar(value=False)
+        self.auto_crop_var = tk.BooleanVar(value=False)
+        self.crop_padding_var = tk.StringVar(value=str(AUTO_CROP_PADDING_PT))
+        self.page_timeout_var = tk.StringVar(value=str(ISOLATED_PAGE_TIMEOUT_S))
+        self.page_memory_var = tk.StringVar(value=str(ISOLATED_PAGE_MEMORY_MB))
         self.status_queue = queue.Queue()
+        self.batch_progress = None
+        self.batch_options = {} # Option values parsed once per batch; the fields stay editable meanwhile
         self.is_converting = False
         self.logo_image = None
         self.icon_image = None
@@ -424,8 +1268,21 @@ class PdfToEpubApp(TkinterDnD.Tk):
 
         options_frame = ttk.LabelFrame(options_output_outer_frame, text="Options", padding=(15, 10))
         options_frame.grid(row=0, column=0, padx=(0, 10), sticky="nsew")
-        ttk.Label(options_frame, text="Rendering DPI:").pack(side=tk.LEFT, padx=(0, 5), pady=5)
-        ttk.Entry(options_frame, textvariable=self.dpi_var, width=6).pack(side=tk.LEFT, pady=5)
+        ttk.Label(options_frame, text="Rendering DPI:").grid(row=0, column=0, padx=(0, 5), pady=5, sticky="w")
+        ttk.Entry(options_frame, textvariable=self.dpi_var, width=6).grid(row=0, column=1, pady=5, sticky="w")
+        ttk.Label(options_frame, text="Max pages/volume:").grid(row=1, column=0, padx=(0, 5), pady=5, sticky="w")
+        ttk.Entry(options_frame, textvariable=self.max_volume_pages_var, width=6).grid(row=1, column=1, pady=5, sticky="w")
+        ttk.Label(options_frame, text="Max MB/volume:").grid(row=2, column=0, padx=(0, 5), pady=5, sticky="w")
+        ttk.Entry(options_frame, textvariable=self.max_volume_mb_var, width=6).grid(row=2, column=1, pady=5, sticky="w")
+        ttk.Checkbutton(options_frame, text="MRC compression (scans)", variable=self.mrc_var).grid(row=3, column=0, columnspan=2, pady=5, sticky="w")
+        ttk.Checkbutton(options_frame, text="Auto-crop margins", variable=self.auto_crop_var).grid(row=3, column=2, columnspan=2, padx=(15, 0), pady=5, sticky="w")
+        ttk.Label(options_frame, text="Crop padding (pt):").grid(row=4, column=2, padx=(15, 5), pady=5, sticky="w")
+        ttk.Entry(options_frame, textvariable=self.crop_padding_var, width=6).grid(row=4, column=3, pady=5, sticky="w")
+        ttk.Checkbutton(options_frame, text="Isolated rendering", variable=self.isolated_var).grid(row=0, column=2, columnspan=2, padx=(15, 0), pady=5, sticky="w")
+        ttk.Label(options_frame, text="Page timeout (s):").grid(row=1, column=2, padx=(15, 5), pady=5, sticky="w")
+        ttk.Entry(options_frame, textvariable=self.page_timeout_var, width=6).grid(row=1, column=3, pady=5, sticky="w")
+        ttk.Label(options_frame, text="Page memory (MB):").grid(row=2, column=2, padx=(15, 5), pady=5, sticky="w")
+        ttk.Entry(options_frame, textvariable=self.page_memory_var, width=6).grid(row=2, column=3, pady=5, sticky="w")
 
         output_frame = ttk.LabelFrame(options_output_outer_frame, text="Output Directory (Optional)", padding=(15, 10))
         output_frame.grid(row=0, column=1, padx=(10, 0), sticky="nsew")
@@ -450,6 +1307,8 @@ class PdfToEpubApp(TkinterDnD.Tk):
         self.progress_var = tk.DoubleVar()
         self.progressbar = ttk.Progressbar(progress_frame, orient="horizontal", mode="determinate", variable=self.progress_var, style="custom.Horizontal.TProgressbar")
         self.progressbar.grid(row=0, column=0, sticky="ew", ipady=2) # ipady for internal padding
+        self.progress_info_var = tk.StringVar()
+        ttk.Label(progress_frame, textvariable=self.progress_info_var, foreground=SECONDARY_TEXT_COLOR, font=("Segoe UI", 8)).grid(row=1, column=0, sticky="w", pady=(3, 0))
 
         # --- Log Display Area (Row 6) - Now taller ---
         log_frame = ttk.LabelFrame(self, text="Logs & Status", padding=(15, 10))
@@ -588,20 +1447,36 @@ class PdfToEpubApp(TkinterDnD.Tk):
         try:
             while True:
                 message = self.status_queue.get_nowait()
-                if message == "DONE_FILE":
+                if isinstance(message, tuple):
+                    # Structured progress events: ("PAGE_COUNT", index, pages) / ("PAGES_COUNTED",) from the
+                    # counting pass, ("FILE_PAGES", pages, passes) / ("PAGE_DONE", done, total) /
+                    # ("PAGE_PACKAGED", done, total) from the worker
+                    if message[0] == "PAGES_COUNTED":
+                        self._start_next_conversion()
+                    elif self.batch_progress:
+                        if message[0] == "PAGE_COUNT":
+                            self.batch_progress.set_file_pages(message[2], index=message[1])
+                        elif message[0] == "FILE_PAGES":
+                            self.batch_progress.set_file_pages(message[1], passes=message[2])
+                        elif message[0] == "PAGE_DONE":
+                            self.batch_progress.page_done(message[1])
+                        elif message[0] == "PAGE_PACKAGED":
+                            self.batch_progress.page_packaged(message[1])
+                        self.progress_var.set(self.batch_progress.fraction * 100)
+                elif message == "DONE_FILE":
                     # print("DEBUG: GUI received DONE_FILE") # Remove
                     completed_count = self.current_conversion_index + 1
-                    if self.pdf_file_list:
-                        progress = (completed_count / len(self.pdf_file_list)) * 100
-                        self.progress_var.set(progress)
+                    if self.batch_progress:
+                        self.batch_progress.finish_file()
+                        self.progress_var.set(self.batch_progress.fraction * 100)
                     self.update_status(f"✅ File {completed_count} completed.")
                     self._start_next_conversion()
                 elif message == "ERROR_FILE":
                      # print("DEBUG: GUI received ERROR_FILE") # Remove
                      completed_count = self.current_conversion_index + 1
-                     if self.pdf_file_list:
-                         progress = (completed_count / len(self.pdf_file_list)) * 100
-                         self.progress_var.set(progress)
+                     if self.batch_progress:
+                         self.batch_progress.finish_file(succeeded=False)
+                         self.progress_var.set(self.batch_progress.fraction * 100)
                      self.update_status(f"❌ Error processing file {completed_count}. See details above.")
                      self._start_next_conversion()
                 else:
@@ -612,6 +1487,8 @@ class PdfToEpubApp(TkinterDnD.Tk):
             error_msg = f"Error processing status queue: {e}"
             print(error_msg)
             self.update_status(f"GUI ERROR: {error_msg}")
+        if self.is_converting and self.batch_progress:
+            self.progress_info_var.set(self.batch_progress.describe()) # Refreshed every tick so stalls show up
         self.after(100, self.check_status_queue)
 
     def _start_next_conversion(self):
@@ -622,6 +1499,8 @@ class PdfToEpubApp(TkinterDnD.Tk):
             pdf_path = self.pdf_file_list[self.current_conversion_index]
             filename = os.path.basename(pdf_path)
             self.update_status(f"\n[{self.current_conversion_index + 1}/{len(self.pdf_file_list)}] Starting: {filename}...")
+            if self.batch_progress:
+                self.batch_progress.start_file(self.current_conversion_index)
             try:
                 dpi = int(self.dpi_var.get())
                 if dpi <= 0: raise ValueError("DPI must be positive")
@@ -638,7 +1517,15 @@ class PdfToEpubApp(TkinterDnD.Tk):
                     'pdf_path': pdf_path,
                     'dpi': dpi,
                     'status_queue': self.status_queue,
-                    'output_dir': output_dir
+                    'output_dir': output_dir,
+                    'max_volume_pages': self.batch_options['max_volume_pages'],
+                    'max_volume_mb': self.batch_options['max_volume_mb'],
+                    'isolated': self.isolated_var.get(),
+                    'page_timeout_s': self.batch_options['page_timeout_s'],
+                    'page_memory_mb': self.batch_options['page_memory_mb'],
+                    'mrc': self.mrc_var.get(),
+                    'auto_crop': self.auto_crop_var.get(),
+                    'crop_padding': self.batch_options['crop_padding']
                     },
                 daemon=True
             )
@@ -646,6 +1533,31 @@ class PdfToEpubApp(TkinterDnD.Tk):
         else:
             self.stop_batch_conversion("✅ Batch conversion finished.")
 
+    def _get_volume_limits(self):
+        """Parses the volume split fields. Returns (max_pages, max_mb); blank fields give None."""
+        pages_str = self.max_volume_pages_var.get().strip()
+        mb_str = self.max_volume_mb_var.get().strip()
+        max_pages = int(pages_str) if pages_str else None
+        max_mb = float(mb_str) if mb_str else None
+        if (max_pages is not None and max_pages <= 0) or (max_mb is not None and max_mb <= 0):
+            raise ValueError("Volume limits must be positive")
+        return max_pages, max_mb
+
+    def _get_isolation_limits(self):
+        """Parses the isolated render limits. Returns (timeout_s, memory_mb)."""
+        timeout_s = float(self.page_timeout_var.get())
+        memory_mb = int(self.page_memory_var.get())
+        if timeout_s <= 0 or memory_mb <= 0:
+            raise ValueError("Isolation limits must be positive")
+        return timeout_s, memory_mb
+
+    def _get_crop_padding(self):
+        """Parses the auto-crop padding field (points, zero or more)."""
+        padding = float(self.crop_padding_var.get())
+        if padding < 0:
+            raise ValueError("Crop padding must not be negative")
+        return padding
+
     def stop_batch_conversion(self, final_message="Conversion stopped."):
         """Handles UI changes when batch stops (completed or error)."""
         self.update_status(f"\n--- {final_message} ---")
@@ -653,6 +1565,8 @@ class PdfToEpubApp(TkinterDnD.Tk):
         self.convert_button.config(state="normal")
         self.browse_button.config(state="normal")
         self.clear_button.config(state="normal")
+        if self.batch_progress:
+            self.progress_info_var.set(self.batch_progress.summary())
         if "finished" in final_message.lower() or "completed" in final_message.lower():
             self.progress_var.set(100.0)
             self.progressbar['value'] = 100
@@ -674,6 +1588,28 @@ class PdfToEpubApp(TkinterDnD.Tk):
             messagebox.showerror("Input Error", "Please enter a valid positive integer for DPI (e.g., 150).")
             return
 
+        try:
+            max_volume_pages, max_volume_mb = self._get_volume_limits()
+        except ValueError:
+            messagebox.showerror("Input Error", "Volume limits must be blank or positive numbers (pages: integer, size: MB).")
+            return
+
+        try:
+            page_timeout_s, page_memory_mb = self._get_isolation_limits()
+        except ValueError:
+            messagebox.showerror("Input Error", "Page timeout and page memory must be positive numbers (memory: integer MB).")
+            return
+
+        try:
+            crop_padding = self._get_crop_padding()
+        except ValueError:
+            messagebox.showerror("Input Error", "Crop padding must be a number of points (0 or more).")
+            return
+
+        self.batch_options = {'max_volume_pages': max_volume_pages, 'max_volume_mb': max_volume_mb,
+                              'page_timeout_s': page_timeout_s, 'page_memory_mb': page_memory_mb,
+                              'crop_padding': crop_padding}
+
         output_dir = self.output_dir_path.get() or None
         if output_dir and not os.path.isdir(output_dir):
              messagebox.showerror("Output Error", f"Selected output directory does not exist:\n{output_dir}")
@@ -699,10 +1635,13 @@ class PdfToEpubApp(TkinterDnD.Tk):
         self.progress_var.set(0.0)
         self.progressbar['value'] = 0
         self.progressbar['maximum'] = 100
+        self.batch_progress = BatchProgress([0] * len(self.pdf_file_list))
+        self.progress_info_var.set(self.batch_progress.describe())
         self.update_idletasks()
 
+        # The first file starts once the counting pass reports PAGES_COUNTED.
         self.current_conversion_index = -1
-        self._start_next_conversion()
+        threading.Thread(target=count_batch_pages, args=(list(self.pdf_file_list), self.status_queue), daemon=True).start()
 
     def update_file_list_display(self):
         """Updates the text area showing the list of files or a placeholder."""